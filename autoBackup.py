@@ -1,55 +1,103 @@
+import functools
 import os
+import re
+import shlex
+import shutil
+import sqlite3
+import stat
 import subprocess
+import tarfile
 import logging
 import time
 import paramiko
 import schedule
 from tqdm import tqdm
-from dotenv import load_dotenv, dotenv_values
+from dotenv import dotenv_values
 from sendgrid import SendGridAPIClient
 from sendgrid.helpers.mail import Mail
 from plyer import notification
-from threading import Lock, Thread
+from threading import Event, Lock, Thread
+from collections import defaultdict
+from contextlib import closing, contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import tkinter as tk
 from tkinter import messagebox
 import queue
+import win32api
+import win32con
+import win32file
+import win32gui
+import win32gui_struct
 
 # Global locks for thread-safe file operations
 file_lock = Lock()
 active_transfer_lock = Lock()
-active_transfer = False
+active_transfers = 0  # Number of downloads/copies currently running
+no_active_transfer = Event()  # Set whenever active_transfers is zero
+no_active_transfer.set()
 lecteur = None
-usb_prompted = False  # Flag to indicate if the user has been prompted for USB backup
+usb_prompted = set()  # Drive letters the user has already been prompted for
 usb_queue = queue.Queue()
+ssh_clients = {}  # server -> SSHClient kept open across scheduled runs
+ssh_clients_lock = Lock()
+backups_running = set()  # Config names (SERVER_<index>) with a perform_backup call in progress
+backups_running_lock = Lock()
+dir_cache = {}  # path -> (directory mtime_ns, frozenset of entry names)
+
+# SERVER_<index>_<FIELD> keys in the .env file
+SERVER_ENV_KEY = re.compile(r'^SERVER_(\d+)_([A-Z_]+)$')
+
+# Anything other than alphanumerics, space, '.', '_' and '-' (\w matches str.isalnum() plus '_')
+UNSAFE_FILENAME_CHARS = re.compile(r'[^\w .-]')
+
+# Manifest of downloaded files and the secondary paths they have been mirrored to
+MANIFEST_PATH = os.path.join(os.path.dirname(__file__), 'backup_state.db')
+manifest_lock = Lock()
+
+# SFTP transfer tuning
+SSH_KEEPALIVE_INTERVAL = 30  # seconds
+SSH_WINDOW_SIZE = 2 ** 27  # 128 MiB, paramiko's 2 MiB default caps throughput at window / RTT
+SSH_MAX_PACKET_SIZE = 32768
+SSH_REKEY_BYTES = 2 ** 40
+PART_SUFFIX = ".part"  # In-progress downloads sit next to their final path until complete
+SFTP_CHUNK_SIZE = 32768  # paramiko's MAX_REQUEST_SIZE
+MAX_DOWNLOAD_WORKERS = 8
+MAX_MIRROR_WORKERS = 8
+MAX_PARALLEL_BACKUPS = 8
+TAR_STREAM_MIN_FILES = 20
+TAR_STREAM_MAX_AVERAGE_SIZE = 1024 * 1024  # 1 MiB
 
 
 def load_all_configurations():
     """Load and validate configurations for all servers from environment variables."""
     dotenv_path = os.path.join(os.path.dirname(__file__), '.env')
-    load_dotenv(dotenv_path)
     all_configs = []
     env_vars = dotenv_values(dotenv_path)
 
     logging.info(f"Loaded environment variables from {dotenv_path}")
 
-    # Detect server indexes
-    server_indexes = set()
-    for key in env_vars:
-        if key.startswith("SERVER_") and key.endswith("_IP"):
-            index = key.split('_')[1]
-            server_indexes.add(index)
+    # Group SERVER_<index>_<FIELD> entries by index in a single pass
+    servers = defaultdict(dict)
+    for key, value in env_vars.items():
+        match = SERVER_ENV_KEY.match(key)
+        if match:
+            servers[match.group(1)][match.group(2)] = value
+    server_indexes = sorted((index for index, fields in servers.items() if 'IP' in fields), key=int)
 
     logging.info(f"Detected server indexes: {server_indexes}")
 
     for index in server_indexes:
+        fields = servers[index]
         config = {
-            'server': env_vars.get(f"SERVER_{index}_IP", ""),
-            'username': env_vars.get(f"SERVER_{index}_USERNAME", ""),
-            'password': env_vars.get(f"SERVER_{index}_PASSWORD", ""),
-            'source_path': env_vars.get(f"SERVER_{index}_SOURCE_PATH", ""),
-            'primary_backup_path': env_vars.get(f"SERVER_{index}_PRIMARY_BACKUP_PATH", "").replace('/', '\\'),
+            'name': f"SERVER_{index}",
+            'server': fields.get("IP", ""),
+            'username': fields.get("USERNAME", ""),
+            'password': fields.get("PASSWORD", ""),
+            'source_path': fields.get("SOURCE_PATH", ""),
+            'primary_backup_path': fields.get("PRIMARY_BACKUP_PATH", "").replace('/', '\\'),
             'secondary_backup_paths': [path.replace('/', '\\') for path in
-                                       env_vars.get(f"SERVER_{index}_SECONDARY_BACKUP_PATHS", "").split(',') if path],
+                                       fields.get("SECONDARY_BACKUP_PATHS", "").split(',') if path],
+            'usb_backup': fields.get("USB_BACKUP", "yes").lower(),
             'sendgrid_api_key': env_vars.get("SENDGRID_API_KEY", ""),
             'email_sender': env_vars.get("EMAIL_SENDER", ""),
             'email_recipient': env_vars.get("EMAIL_RECIPIENT", ""),
@@ -118,6 +166,12 @@ def connect_ssh(config):
     for attempt in range(retries):
         try:
             ssh.connect(config['server'], username=config['username'], password=config['password'])
+            transport = ssh.get_transport()
+            transport.set_keepalive(SSH_KEEPALIVE_INTERVAL)
+            # Channels opened from here on (SFTP sessions) use a window sized for bulk transfer
+            transport.default_window_size = SSH_WINDOW_SIZE
+            transport.default_max_packet_size = SSH_MAX_PACKET_SIZE
+            transport.packetizer.REKEY_BYTES = SSH_REKEY_BYTES
             logging.info(f"SSH connection established for server {config['server']}")
             return ssh
         except paramiko.AuthenticationException:
@@ -136,19 +190,125 @@ def connect_ssh(config):
                 return None
 
 
+def get_ssh(config):
+    """Return (ssh, reused) for a server, reconnecting if the cached connection has dropped."""
+    with ssh_clients_lock:
+        ssh = ssh_clients.get(config['server'])
+    if ssh:
+        transport = ssh.get_transport()
+        if transport and transport.is_active():
+            return ssh, True
+        logging.info(f"SSH connection to server {config['server']} was lost, reconnecting.")
+        close_ssh(config['server'])
+    ssh = connect_ssh(config)
+    if ssh:
+        with ssh_clients_lock:
+            ssh_clients[config['server']] = ssh
+    return ssh, False
+
+
+def close_ssh(server):
+    """Close and forget the cached SSH connection for a server."""
+    with ssh_clients_lock:
+        ssh = ssh_clients.pop(server, None)
+    if ssh:
+        ssh.close()
+        logging.info(f"SSH connection closed for server {server}.")
+
+
+def close_all_ssh():
+    """Close every cached SSH connection."""
+    with ssh_clients_lock:
+        servers = list(ssh_clients)
+    for server in servers:
+        close_ssh(server)
+
+
+def cached_listdir(path):
+    """List a directory, reusing the previous listing while the directory mtime is unchanged."""
+    mtime = os.stat(path).st_mtime_ns
+    cached = dir_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    entries = frozenset(os.listdir(path))
+    dir_cache[path] = (mtime, entries)
+    return entries
+
+
+def connect_manifest():
+    """Open the backup manifest database, creating its table if needed."""
+    conn = sqlite3.connect(MANIFEST_PATH)
+    # Rows are keyed by config name (SERVER_<index>), since several configs may share one host
+    conn.execute("""CREATE TABLE IF NOT EXISTS files (
+                        config TEXT, name TEXT, mtime INTEGER, size INTEGER,
+                        synced_primary INT, synced_secondary TEXT,
+                        PRIMARY KEY(config, name))""")
+    return conn
+
+
+def record_download(config_name, name, mtime, size):
+    """Record a file that has landed in the primary backup directory."""
+    with manifest_lock, closing(connect_manifest()) as conn, conn:
+        conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, 1, '')", (config_name, name, mtime, size))
+
+
+def track_local_files(config_name, primary_backup_path, local_files):
+    """Add primary backup files that are missing from the manifest, e.g. after an upgrade or a crash."""
+    with manifest_lock, closing(connect_manifest()) as conn, conn:
+        tracked = {name for (name,) in conn.execute("SELECT name FROM files WHERE config = ?", (config_name,))}
+        rows = []
+        for name in local_files - tracked:
+            if name.endswith(PART_SUFFIX):
+                continue
+            try:
+                st = os.stat(os.path.join(primary_backup_path, name))
+            except FileNotFoundError:
+                continue
+            if stat.S_ISREG(st.st_mode):
+                rows.append((config_name, name, int(st.st_mtime), st.st_size))
+        if rows:
+            conn.executemany("INSERT OR IGNORE INTO files VALUES (?, ?, ?, ?, 1, '')", rows)
+            logging.info(f"Added {len(rows)} untracked files to the manifest for {config_name}")
+
+
+def files_pending_sync(config_name, secondary_path):
+    """Return the primary backup files not yet mirrored to a secondary path."""
+    with manifest_lock, closing(connect_manifest()) as conn:
+        rows = conn.execute("SELECT name, synced_secondary FROM files WHERE config = ? AND synced_primary = 1",
+                            (config_name,)).fetchall()
+    return [name for name, synced in rows if secondary_path not in synced.split(',')]
+
+
+def mark_secondary_synced(config_name, name, secondary_path):
+    """Record that a file has been mirrored to a secondary path."""
+    with manifest_lock, closing(connect_manifest()) as conn, conn:
+        conn.execute("""UPDATE files
+                        SET synced_secondary = CASE WHEN synced_secondary = '' THEN ?
+                                                    ELSE synced_secondary || ',' || ? END
+                        WHERE config = ? AND name = ?""", (secondary_path, secondary_path, config_name, name))
+
+
+def forget_file(config_name, name):
+    """Drop a file that no longer exists in the primary backup directory from the manifest."""
+    with manifest_lock, closing(connect_manifest()) as conn, conn:
+        conn.execute("DELETE FROM files WHERE config = ? AND name = ?", (config_name, name))
+
+
+@functools.lru_cache(maxsize=4096)
 def sanitize_filename(filename):
     """Sanitize the filename for use in the Windows file system."""
-    return "".join(c if c.isalnum() or c in (' ', '.', '_', '-') else '_' for c in filename)
+    return UNSAFE_FILENAME_CHARS.sub('_', filename)
 
 
-def perform_backup(config):
+def perform_backup(config, retry_stale_connection=True):
     """Perform the backup operations."""
     logging.info(f"Starting backup for server {config['server']}")
 
-    ssh = connect_ssh(config)
+    ssh, reused = get_ssh(config)
     if not ssh:
         return False
 
+    sftp = None
     try:
         sftp = ssh.open_sftp()
 
@@ -156,20 +316,28 @@ def perform_backup(config):
         show_notification("Backup Script", f"Starting backup process for server {config['server']}.")
 
         logging.info(f"Retrieving list of backup files from {config['source_path']}")
-        stdin, stdout, stderr = ssh.exec_command(f"ls -lt --time-style=+%s {config['source_path']}")
-        remote_files = stdout.read().decode().splitlines()
+        try:
+            remote_files = sftp.listdir_attr(config['source_path'])
+        except OSError as e:
+            logging.error(f"Failed to list {config['source_path']} on server {config['server']}: {e}")
+            send_email("Backup Script Error",
+                       f"Failed to list {config['source_path']} on server {config['server']}: {e}", config)
+            show_notification("Backup Script Error",
+                              f"Failed to list {config['source_path']} on server {config['server']}: {e}")
+            return False
 
         with file_lock:
-            local_files = set(os.listdir(config['primary_backup_path']))
+            local_files = cached_listdir(config['primary_backup_path'])
+        # Checked on every run so files that landed without a manifest row still get mirrored
+        track_local_files(config['name'], config['primary_backup_path'], local_files)
 
         new_files = []
-        for line in remote_files:
-            parts = line.split()
-            if len(parts) >= 6:
-                filename = parts[-1]
-                sanitized_filename = sanitize_filename(filename)
-                if sanitized_filename not in local_files:
-                    new_files.append((filename, int(parts[-2])))
+        # Newest first, skipping hidden entries and directories as `ls -lt` used to
+        for attr in sorted(remote_files, key=lambda a: a.st_mtime, reverse=True):
+            if attr.filename.startswith('.') or not stat.S_ISREG(attr.st_mode):
+                continue
+            if sanitize_filename(attr.filename) not in local_files:
+                new_files.append((attr.filename, attr.st_mtime, attr.st_size))
 
         logging.info(f"New files to download: {len(new_files)}")
 
@@ -178,52 +346,34 @@ def perform_backup(config):
             show_notification("Backup Script", f"No new files to download for server {config['server']}.")
             return
 
-        temp_dir = os.path.join(config['primary_backup_path'], "temp")
-        os.makedirs(temp_dir, exist_ok=True)
-
+        sftp_pool = queue.Queue()
+        extra_sftp = []
         try:
-            with active_transfer_lock:
-                global active_transfer
-                active_transfer = True
-
-            for i, (file, mtime) in enumerate(new_files):
-                sanitized_file = sanitize_filename(file)
-                try:
-                    remote_file_path = os.path.join(config['source_path'], file).replace('\\', '/')
-                    temp_file_path = os.path.join(temp_dir, sanitized_file)
-
-                    if os.path.exists(temp_file_path) or os.path.exists(
-                            os.path.join(config['primary_backup_path'], sanitized_file)):
-                        logging.info(f"File {sanitized_file} already exists, skipping download.")
-                        continue
-
-                    file_size = sftp.stat(remote_file_path).st_size
-
-                    with open(temp_file_path, 'wb') as f, tqdm(total=file_size, unit="B", unit_scale=True,
-                                                               unit_divisor=1024, miniters=1,
-                                                               desc=f"Downloading {sanitized_file}") as pbar:
-                        sftp.getfo(remote_file_path, f, callback=lambda x, y: pbar.update(x - pbar.n))
-
-                        # Add throttling
-                        time.sleep(0.1)  # Adjust the sleep time as necessary
-
-                    logging.info(f"Downloaded {sanitized_file}")
-
-                    final_file_path = os.path.join(config['primary_backup_path'], sanitized_file)
-                    os.rename(temp_file_path, final_file_path)
-                    logging.info(f"Moved {sanitized_file} to {final_file_path}")
-
-                    # Set the modification time to match the source file
-                    os.utime(final_file_path, (mtime, mtime))
-
-                except Exception as e:
-                    logging.error(f"Failed to copy {sanitized_file}: {e}")
-                    send_email("Backup Script Error", f"Failed to copy {sanitized_file}: {e}", config)
-                    show_notification("Backup Script Error", f"Failed to copy {sanitized_file}: {e}")
+            begin_transfer()
 
-            cleanup_temp_directory(temp_dir)
-
-            synchronize_directories(config['primary_backup_path'], config['secondary_backup_paths'])
+            downloads_ok = True
+            average_size = sum(file_size for _, _, file_size in new_files) / len(new_files)
+            if len(new_files) > TAR_STREAM_MIN_FILES and average_size < TAR_STREAM_MAX_AVERAGE_SIZE:
+                # Many small files: one streamed tar beats several round-trips per file
+                downloads_ok = download_tar_stream(ssh, config, new_files)
+            else:
+                # One SFTP channel per worker so downloads run in parallel over the same transport
+                workers = min(MAX_DOWNLOAD_WORKERS, len(new_files))
+                for _ in range(workers - 1):
+                    extra_sftp.append(ssh.open_sftp())
+                for client in [sftp] + extra_sftp:
+                    sftp_pool.put(client)
+
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    futures = [executor.submit(download_new_file, config, sftp_pool, file, mtime, file_size)
+                               for file, mtime, file_size in new_files]
+                    for future in as_completed(futures):
+                        future.result()
+
+            synchronize_directories(config)
+            if not downloads_ok:
+                # The failure has already been reported; mirror what did arrive but don't announce success
+                return False
 
             logging.info(f"Backup complete for server {config['server']}.")
             send_email("Backup Script Success", f"Backup complete for server {config['server']}.", config)
@@ -240,55 +390,212 @@ def perform_backup(config):
             show_notification("Backup Script Error", f"Unexpected error occurred during backup: {e}")
             return False
         finally:
-            with active_transfer_lock:
-                active_transfer = False
-            if sftp:
-                sftp.close()
+            end_transfer()
+            for client in extra_sftp:
+                client.close()
+    except (paramiko.SSHException, EOFError) as e:
+        # Drop the cached connection so the next attempt starts from a fresh handshake
+        logging.error(f"SSH session with server {config['server']} failed: {e}")
+        close_ssh(config['server'])
+        if not (reused and retry_stale_connection):
+            return False
+    finally:
+        # The transport outlives this run, so the SFTP channel must be closed on every path
+        if sftp:
+            sftp.close()
             logging.info("SFTP connection closed.")
+
+    # A cached connection can die silently between scheduled runs; reconnect once rather than skip the run
+    logging.info(f"Retrying backup for server {config['server']} on a new SSH connection.")
+    return perform_backup(config, retry_stale_connection=False)
+
+
+def download_file(sftp, remote_file_path, local_file_path, file_size, desc):
+    """Download a remote file, keeping a pipeline of SFTP read requests in flight."""
+    with file_size_progress(local_file_path, file_size, desc), sftp.open(remote_file_path, 'rb') as remote, \
+            open(local_file_path, 'wb', opener=open_sequential) as f:
+        remote.prefetch(file_size)
+        while True:
+            buf = remote.read(SFTP_CHUNK_SIZE)
+            if not buf:
+                break
+            f.write(buf)
+
+
+def download_new_file(config, sftp_pool, file, mtime, file_size):
+    """Download a single new file into the primary backup directory."""
+    sanitized_file = sanitize_filename(file)
+    final_file_path = os.path.join(config['primary_backup_path'], sanitized_file)
+    part_file_path = final_file_path + PART_SUFFIX
+    try:
+        remote_file_path = os.path.join(config['source_path'], file).replace('\\', '/')
+
+        if os.path.exists(final_file_path):
+            logging.info(f"File {sanitized_file} already exists, skipping download.")
+            return
+
+        sftp = sftp_pool.get()
+        try:
+            download_file(sftp, remote_file_path, part_file_path, file_size, f"Downloading {sanitized_file}")
+        finally:
+            sftp_pool.put(sftp)
+
+        logging.info(f"Downloaded {sanitized_file}")
+
+        os.replace(part_file_path, final_file_path)
+        logging.info(f"Moved {sanitized_file} to {final_file_path}")
+
+        # Set the modification time to match the source file
+        os.utime(final_file_path, (mtime, mtime))
+        record_download(config['name'], sanitized_file, mtime, file_size)
+
+    except Exception as e:
+        logging.error(f"Failed to copy {sanitized_file}: {e}")
+        if os.path.exists(part_file_path):
+            os.remove(part_file_path)
+        send_email("Backup Script Error", f"Failed to copy {sanitized_file}: {e}", config)
+        show_notification("Backup Script Error", f"Failed to copy {sanitized_file}: {e}")
+
+
+def download_tar_stream(ssh, config, new_files):
+    """Download many files at once by extracting a tar stream produced on the server, returning success."""
+    listing = {file: (mtime, file_size) for file, mtime, file_size in new_files}
+    # Names go over stdin: on the command line a large backlog would exceed the remote ARG_MAX
+    stdin, stdout, stderr = ssh.exec_command(f"tar -C {shlex.quote(config['source_path'])} --null -T - -cf -")
+    try:
+        stdin.write(''.join(f"{file}\0" for file in listing).encode())
+        stdin.channel.shutdown_write()
+
+        total_size = sum(file_size for _, file_size in listing.values())
+        with tarfile.open(fileobj=stdout, mode='r|') as tar, tqdm(total=total_size, unit="B", unit_scale=True,
+                                                                 unit_divisor=1024, mininterval=0.25,
+                                                                 maxinterval=1.0,
+                                                                 desc=f"Downloading {len(listing)} files") as pbar:
+            for member in tar:
+                if not member.isfile() or member.name not in listing:
+                    continue
+                mtime, file_size = listing[member.name]
+                sanitized_file = sanitize_filename(member.name)
+                final_file_path = os.path.join(config['primary_backup_path'], sanitized_file)
+                part_file_path = final_file_path + PART_SUFFIX
+                try:
+                    with tar.extractfile(member) as src, open(part_file_path, 'wb', opener=open_sequential) as dst:
+                        shutil.copyfileobj(src, dst, SFTP_CHUNK_SIZE)
+                    os.replace(part_file_path, final_file_path)
+                except Exception:
+                    if os.path.exists(part_file_path):
+                        os.remove(part_file_path)
+                    raise
+                pbar.update(member.size)
+
+                # Set the modification time to match the source file
+                os.utime(final_file_path, (mtime, mtime))
+                record_download(config['name'], sanitized_file, mtime, file_size)
+                logging.info(f"Downloaded {sanitized_file}")
+
+        exit_status = stdout.channel.recv_exit_status()
+        if exit_status != 0:
+            error = stderr.read().decode(errors='replace').strip()
+            logging.error(f"Remote tar exited with status {exit_status}: {error}")
+            send_email("Backup Script Error", f"Remote tar exited with status {exit_status}: {error}", config)
+            show_notification("Backup Script Error", f"Remote tar exited with status {exit_status}: {error}")
+            return False
+        return True
     finally:
-        if ssh:
-            ssh.close()
-        logging.info("SSH connection closed.")
+        stdout.channel.close()
+
+
+def open_sequential(path, flags):
+    """Opener that tells the OS a file will be written front to back."""
+    # O_SEQUENTIAL maps to FILE_FLAG_SEQUENTIAL_SCAN on Windows
+    fd = os.open(path, flags | getattr(os, 'O_SEQUENTIAL', 0), 0o666)
+    if hasattr(os, 'posix_fadvise'):
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+    return fd
 
 
-def cleanup_temp_directory(temp_dir):
-    """Clean up the temporary directory."""
+def poll_file_size(path, pbar, done, interval=0.25):
+    """Advance a progress bar to the current size of a file until done is set."""
+    while not done.wait(interval):
+        try:
+            pbar.update(os.path.getsize(path) - pbar.n)
+        except OSError:
+            pass
+
+
+@contextmanager
+def file_size_progress(path, total, desc):
+    """Show a progress bar for a file being written, updated from a poller thread rather than per chunk."""
+    with tqdm(total=total, unit="B", unit_scale=True, unit_divisor=1024, mininterval=0.25, maxinterval=1.0,
+              desc=desc) as pbar:
+        done = Event()
+        poller = Thread(target=poll_file_size, args=(path, pbar, done), daemon=True)
+        poller.start()
+        try:
+            yield
+        finally:
+            done.set()
+            poller.join()
+        pbar.update(total - pbar.n)
+
+
+def copy_file_with_progress(src_file, dest_file, desc, src_stat=None):
+    """Copy a file with shutil.copy2 (CopyFile2 on Windows), keeping its mtime and polling the destination size."""
+    if src_stat is None:
+        src_stat = os.stat(src_file)
+    with file_size_progress(dest_file, src_stat.st_size, desc):
+        shutil.copy2(src_file, dest_file)
+
+
+def is_complete_copy(src_stat, dest_stat):
+    """Return whether a destination with dest_stat is a full, current copy of the file with src_stat."""
+    # 2 s tolerance covers FAT's mtime resolution on USB drives
+    return dest_stat.st_size == src_stat.st_size and abs(dest_stat.st_mtime - src_stat.st_mtime) < 2
+
+
+def mirror_file(config, secondary_path, file):
+    """Copy one primary backup file to a secondary directory and record it in the manifest."""
+    config_name = config['name']
+    primary_backup_path = config['primary_backup_path']
+    src_file = os.path.join(primary_backup_path, file)
+    dest_file = os.path.join(secondary_path, file)
+    try:
+        src_stat = os.stat(src_file)
+    except FileNotFoundError:
+        logging.info(f"File {file} is no longer in {primary_backup_path}, removing it from the manifest.")
+        forget_file(config_name, file)
+        return
     try:
-        for filename in os.listdir(temp_dir):
-            file_path = os.path.join(temp_dir, filename)
-            os.remove(file_path)
-        os.rmdir(temp_dir)
+        try:
+            dest_stat = os.stat(dest_file)
+        except FileNotFoundError:
+            dest_stat = None
+        if dest_stat and is_complete_copy(src_stat, dest_stat):
+            logging.info(f"File {file} already exists at {secondary_path}, skipping copy.")
+        else:
+            copy_file_with_progress(src_file, dest_file, f"Copying {file} to {secondary_path}", src_stat)
+            logging.info(f"Copied {file} to {secondary_path}")
+        mark_secondary_synced(config_name, file, secondary_path)
     except Exception as e:
-        logging.error(f"Failed to clean up temporary directory: {e}")
+        logging.error(f"Failed to copy {file} to {secondary_path}: {e}")
+        send_email("Backup Script Error", f"Failed to copy {file} to {secondary_path}: {e}", config)
+        show_notification("Backup Script Error", f"Failed to copy {file} to {secondary_path}: {e}")
 
 
-def synchronize_directories(primary_backup_path, secondary_backup_paths):
+def synchronize_directories(config):
     """Synchronize files from the primary backup directory to secondary directories."""
-    primary_files = set(os.listdir(primary_backup_path))
-    for secondary_path in secondary_backup_paths:
-        os.makedirs(secondary_path, exist_ok=True)
-        secondary_files = set(os.listdir(secondary_path))
-        files_to_copy = primary_files - secondary_files
-        for file in files_to_copy:
-            src_file = os.path.join(primary_backup_path, file)
-            dest_file = os.path.join(secondary_path, file)
-            try:
-                file_size = os.path.getsize(src_file)
-                with open(src_file, 'rb') as src, open(dest_file, 'wb') as dst, tqdm(total=file_size, unit="B",
-                                                                                     unit_scale=True, unit_divisor=1024,
-                                                                                     miniters=1,
-                                                                                     desc=f"Copying {file} to {secondary_path}") as pbar:
-                    while True:
-                        buf = src.read(1024 * 1024)  # Read in 1MB chunks
-                        if not buf:
-                            break
-                        dst.write(buf)
-                        pbar.update(len(buf))
-                logging.info(f"Copied {file} to {secondary_path}")
-            except Exception as e:
-                logging.error(f"Failed to copy {file} to {secondary_path}: {e}")
-                send_email("Backup Script Error", f"Failed to copy {file} to {secondary_path}: {e}")
-                show_notification("Backup Script Error", f"Failed to copy {file} to {secondary_path}: {e}")
+    secondary_backup_paths = config['secondary_backup_paths']
+    if not secondary_backup_paths:
+        return
+    # Copies to different secondary paths run concurrently to keep every target disk busy
+    with ThreadPoolExecutor(max_workers=min(MAX_MIRROR_WORKERS, len(secondary_backup_paths) * 2)) as executor:
+        futures = []
+        for secondary_path in secondary_backup_paths:
+            os.makedirs(secondary_path, exist_ok=True)
+            for file in files_pending_sync(config['name'], secondary_path):
+                futures.append(executor.submit(mirror_file, config, secondary_path, file))
+        for future in as_completed(futures):
+            future.result()
 
 
 def prompt_user_for_backup(usb_path):
@@ -320,59 +627,83 @@ def copy_to_usb(usb_path, backup_path):
         return
 
     wait_for_no_active_transfer()
-    with active_transfer_lock:
-        global active_transfer
-        active_transfer = True
+    begin_transfer()
     try:
-        for file_name in os.listdir(backup_path):
+        with os.scandir(backup_path) as entries:
+            backup_entries = {e.name: e for e in entries if e.is_file() and not e.name.endswith(PART_SUFFIX)}
+        with os.scandir(target_folder) as entries:
+            target_entries = {e.name: e for e in entries}
+        for file_name, entry in backup_entries.items():
             src_file = os.path.join(backup_path, file_name)
             dest_file = os.path.join(target_folder, file_name)
-            if os.path.exists(dest_file):
-                logging.info(f"File {file_name} already exists at {target_folder}, skipping copy.")
-                continue
             try:
-                file_size = os.path.getsize(src_file)
-                with open(src_file, 'rb') as src, open(dest_file, 'wb') as dst, tqdm(total=file_size, unit="B",
-                                                                                     unit_scale=True, unit_divisor=1024,
-                                                                                     miniters=1,
-                                                                                     desc=f"Copying {file_name} to {target_folder}") as pbar:
-                    while True:
-                        buf = src.read(1024 * 1024)  # Read in 1MB chunks
-                        if not buf:
-                            break
-                        dst.write(buf)
-                        pbar.update(len(buf))
+                src_stat = entry.stat(follow_symlinks=False)
+                target = target_entries.get(file_name)
+                if target and is_complete_copy(src_stat, target.stat(follow_symlinks=False)):
+                    continue
+                copy_file_with_progress(src_file, dest_file, f"Copying {file_name} to {target_folder}", src_stat)
                 logging.info(f"Copied {file_name} to {target_folder}")
             except Exception as e:
                 logging.error(f"Failed to copy {file_name} to {target_folder}: {e}")
     finally:
-        with active_transfer_lock:
-            active_transfer = False
+        end_transfer()
 
 
-def check_usb(config):
+def usb_drive_letters(unitmask):
+    """Yield the drive letters ('E:') set in a DEV_BROADCAST_VOLUME unit mask."""
+    for i in range(26):
+        if unitmask & (1 << i):
+            yield f"{chr(ord('A') + i)}:"
+
+
+def offer_usb_drive(current_usb, usb_configs):
+    """Queue a USB backup prompt for a newly seen drive letter if it is a removable drive."""
     global lecteur
-    previous_usb = None
-    while True:
-        output = subprocess.check_output("wmic logicaldisk get caption, drivetype", shell=True)
-        data = str(output)
-        x = data.find("2")
-        if x != -1:
-            get = data.find("2")
-            cvt = int(get)
-            divise = cvt - 9
-            getD = data[divise:cvt]
-            current_usb = getD[0:2]
-            if current_usb != previous_usb:
-                previous_usb = current_usb
-                lecteur = current_usb
-                logging.info(f"Your USB label: {lecteur}")
-                if current_usb not in usb_prompted:
-                    usb_queue.put((lecteur, config))
-                    usb_prompted.add(current_usb)
-        else:
-            previous_usb = None
-        time.sleep(10)
+    if win32file.GetDriveType(current_usb + "\\") != win32file.DRIVE_REMOVABLE:
+        return
+    lecteur = current_usb
+    logging.info(f"Your USB label: {lecteur}")
+    if current_usb not in usb_prompted:
+        for config in usb_configs:
+            usb_queue.put((lecteur, config))
+        usb_prompted.add(current_usb)
+
+
+def check_usb(configs):
+    """Listen for WM_DEVICECHANGE and queue a USB backup prompt when a removable drive arrives."""
+    usb_configs = [config for config in configs if config['usb_backup'] == 'yes']
+
+    def on_device_change(hwnd, msg, wparam, lparam):
+        global lecteur
+        if wparam not in (win32con.DBT_DEVICEARRIVAL, win32con.DBT_DEVICEREMOVECOMPLETE) or not lparam:
+            return True
+        info = win32gui_struct.UnpackDEV_BROADCAST(lparam)
+        if info is None or info.devicetype != win32con.DBT_DEVTYP_VOLUME:
+            return True
+        for current_usb in usb_drive_letters(info.unitmask):
+            if wparam == win32con.DBT_DEVICEREMOVECOMPLETE:
+                usb_prompted.discard(current_usb)
+                if current_usb == lecteur:
+                    lecteur = None
+                continue
+            offer_usb_drive(current_usb, usb_configs)
+        return True
+
+    wc = win32gui.WNDCLASS()
+    wc.lpszClassName = "AutoBackupUsbListener"
+    wc.lpfnWndProc = {win32con.WM_DEVICECHANGE: on_device_change}
+    wc.hInstance = win32api.GetModuleHandle(None)
+    class_atom = win32gui.RegisterClass(wc)
+    # A hidden top-level window rather than HWND_MESSAGE: volume arrivals are broadcast,
+    # and message-only windows do not receive broadcast messages.
+    win32gui.CreateWindowEx(0, class_atom, "AutoBackup USB listener", 0, 0, 0, 0, 0, 0, 0, wc.hInstance, None)
+
+    # WM_DEVICECHANGE only reports new arrivals, so offer drives that were plugged in before startup
+    for drive in win32api.GetLogicalDriveStrings().split('\0'):
+        if drive:
+            offer_usb_drive(drive[:2], usb_configs)
+
+    win32gui.PumpMessages()
 
 
 def process_usb_queue():
@@ -385,39 +716,73 @@ def process_usb_queue():
         pass
 
 
+def begin_transfer():
+    """Mark a download or copy as running."""
+    global active_transfers
+    with active_transfer_lock:
+        active_transfers += 1
+        no_active_transfer.clear()
+
+
+def end_transfer():
+    """Mark a download or copy as finished, waking waiters once none are left."""
+    global active_transfers
+    with active_transfer_lock:
+        active_transfers -= 1
+        if active_transfers == 0:
+            no_active_transfer.set()
+
+
 def wait_for_no_active_transfer():
-    while True:
-        with active_transfer_lock:
-            if not active_transfer:
-                break
-        time.sleep(1)
+    no_active_transfer.wait()
 
 
 def safe_eject_usb():
     global lecteur
     if lecteur:
-        with active_transfer_lock:
-            if active_transfer:
-                logging.warning("Cannot eject USB drive. Active transfer in progress.")
-                show_notification("USB Eject Warning", "Cannot eject USB drive. Active transfer in progress.")
-            else:
-                response = input(f"Do you want to safely eject the USB drive {lecteur}? (yes/no): ")
-                if response.strip().lower() == 'yes':
-                    try:
-                        subprocess.check_call(f"powershell (Get-Volume -DriveLetter {lecteur[0]}).DriveLetter")
-                        logging.info(f"USB drive {lecteur} ejected safely.")
-                        lecteur = None
-                        usb_prompted.clear()  # Reset prompted set
-                    except Exception as e:
-                        logging.error(f"Failed to eject USB drive {lecteur}: {e}")
-                        show_notification("USB Eject Error", f"Failed to eject USB drive {lecteur}: {e}")
-
-
-def schedule_backups(config, backup_times):
+        if not no_active_transfer.is_set():
+            logging.warning("Cannot eject USB drive. Active transfer in progress.")
+            show_notification("USB Eject Warning", "Cannot eject USB drive. Active transfer in progress.")
+        else:
+            response = input(f"Do you want to safely eject the USB drive {lecteur}? (yes/no): ")
+            if response.strip().lower() == 'yes':
+                try:
+                    subprocess.check_call(f"powershell (Get-Volume -DriveLetter {lecteur[0]}).DriveLetter")
+                    logging.info(f"USB drive {lecteur} ejected safely.")
+                    usb_prompted.discard(lecteur)
+                    lecteur = None
+                except Exception as e:
+                    logging.error(f"Failed to eject USB drive {lecteur}: {e}")
+                    show_notification("USB Eject Error", f"Failed to eject USB drive {lecteur}: {e}")
+
+
+def run_backup(config):
+    """Run perform_backup for a config unless a backup for it is already running."""
+    # Keyed by config name: several configs may back up different paths from the same host
+    with backups_running_lock:
+        if config['name'] in backups_running:
+            logging.warning(f"Backup for {config['name']} ({config['server']}) is still running, skipping this run.")
+            return False
+        backups_running.add(config['name'])
+    try:
+        return perform_backup(config)
+    except Exception as e:
+        # Runs happen on the executor, so anything left uncaught here would never be seen
+        logging.error(f"Backup for server {config['server']} failed: {e}")
+        send_email("Backup Script Error", f"Backup for server {config['server']} failed: {e}", config)
+        show_notification("Backup Script Error", f"Backup for server {config['server']} failed: {e}")
+        return False
+    finally:
+        with backups_running_lock:
+            backups_running.discard(config['name'])
+
+
+def schedule_backups(config, backup_times, executor):
     """Schedule backups for a specific server configuration."""
     for backup_time in backup_times:
         try:
-            schedule.every().day.at(backup_time).do(perform_backup, config)
+            # Hand the run to the executor so a long backup does not hold up the scheduler tick
+            schedule.every().day.at(backup_time).do(executor.submit, run_backup, config)
             logging.info(f"Scheduled backup for server {config['server']} at {backup_time}")
         except schedule.ScheduleValueError as e:
             logging.error(f"Invalid backup time format '{backup_time}' for server {config['server']}: {e}")
@@ -427,16 +792,15 @@ def main():
     setup_logging()
     configs = load_all_configurations()
 
-    for config in configs:
-        perform_backup(config)
+    # Servers are independent, so back them up side by side
+    executor = ThreadPoolExecutor(max_workers=max(1, min(MAX_PARALLEL_BACKUPS, len(configs))))
+    list(executor.map(run_backup, configs))
 
-    usb_threads = []
-    for config in configs:
-        usb_thread = Thread(target=check_usb, args=(config,))
-        usb_thread.start()
-        usb_threads.append(usb_thread)
+    usb_thread = Thread(target=check_usb, args=(configs,), daemon=True)
+    usb_thread.start()
 
-        schedule_backups(config, config['backup_times'])
+    for config in configs:
+        schedule_backups(config, config['backup_times'], executor)
 
     try:
         while True:
@@ -447,8 +811,8 @@ def main():
         logging.info("Backup process interrupted by user. Exiting...")
         show_notification("Backup Script Interrupted", "Backup process interrupted by user. Exiting...", timeout=5)
     finally:
-        for usb_thread in usb_threads:
-            usb_thread.join()
+        executor.shutdown(wait=False, cancel_futures=True)
+        close_all_ssh()
 
 
 if __name__ == "__main__":
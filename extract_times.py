@@ -0,0 +1,26 @@
+import os
+import re
+
+# Mirrors python-dotenv: quoted values are taken as-is, unquoted ones end at a " #" comment
+BACKUP_TIMES_LINE = re.compile(
+    r'^[ \t]*(?:export[ \t]+)?BACKUP_TIMES[ \t]*=[ \t]*'
+    r'(?:"([^"]*)"|\'([^\']*)\'|(.*?))[ \t]*(?:[ \t]#.*)?\r?$', re.M)
+
+
+def extract_backup_times():
+    # Scan .env directly instead of importing dotenv; a variable already in the environment still wins
+    backup_times = os.environ.get('BACKUP_TIMES')
+    if backup_times is None:
+        dotenv_path = os.path.join(os.path.dirname(__file__), '.env')
+        data = ''
+        if os.path.exists(dotenv_path):
+            with open(dotenv_path, 'r', encoding='utf-8') as f:
+                data = f.read()
+        match = BACKUP_TIMES_LINE.search(data)
+        backup_times = next(value for value in match.groups() if value is not None) if match else "04:00,15:00"
+    return backup_times.split(',')
+
+
+if __name__ == "__main__":
+    times = extract_backup_times()
+    print(",".join(times))